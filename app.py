@@ -1,16 +1,76 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, make_response
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from urllib.parse import urlencode
+from types import SimpleNamespace
+from typing import Optional
+import functools
+import hashlib
 import os
+import sqlite3
+import jinja2
+import orjson
+import redis
+from pydantic import BaseModel, Field, ValidationError
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    # enough connections for every gunicorn thread (see gunicorn.conf.py)
+    'pool_size': 16,
+    'max_overflow': 0,
+    'pool_pre_ping': True,
+    'connect_args': {'check_same_thread': False, 'timeout': 30},
+}
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret')
 
+# compiled templates are shared on disk, so new workers skip parsing them
+# (no directory given: Jinja uses a private 0700 per-user temp dir and checks its owner,
+# since cached bytecode is executed on load)
+app.jinja_env.bytecode_cache = jinja2.FileSystemBytecodeCache()
+
 db = SQLAlchemy(app)
 
+# optional Redis cache; without REDIS_URL every lookup just goes to the database
+REDIS_URL = os.environ.get('REDIS_URL')
+r = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+USER_CACHE_TTL = 900  # seconds
+
+# rendered-page cache; shares Redis when configured, otherwise per-process memory
+if REDIS_URL:
+    app.config.update(CACHE_TYPE='RedisCache', CACHE_REDIS_URL=REDIS_URL)
+else:
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+cache = Cache(app)
+OPEN_JOBS_CACHE_TTL = 60  # seconds; also invalidated whenever a job changes
+PAGE_SIZE = 50  # rows per list on the dashboard/notification pages (each list pages on its own)
+
+# fully spelled out so login cost is explicit and can be profiled/tuned per deployment;
+# scrypt:32768:8:1 is what Werkzeug already writes, so existing hashes are left alone.
+# hashes made with other settings are upgraded on the user's next login
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_conn, conn_record):
+    # WAL lets readers run alongside the writer; NORMAL skips the fsync per commit
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute('PRAGMA journal_mode=WAL')
+    cur.execute('PRAGMA synchronous=NORMAL')
+    cur.execute('PRAGMA temp_store=MEMORY')
+    cur.execute('PRAGMA cache_size=-64000')  # ~64MB
+    cur.execute('PRAGMA mmap_size=268435456')  # 256MB
+    cur.execute('PRAGMA foreign_keys=ON')
+    cur.close()
+
 # ---------------- Models ----------------
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -21,6 +81,10 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Job(db.Model):
+    __table_args__ = (
+        # farmer dashboard: WHERE farmer_id = ? ORDER BY date_posted DESC
+        db.Index('ix_job_farmer_posted', 'farmer_id', db.text('date_posted DESC')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     farmer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -31,50 +95,275 @@ class Job(db.Model):
     location = db.Column(db.String(200))
     contact = db.Column(db.String(50))
     date_posted = db.Column(db.DateTime, default=datetime.utcnow)
+    # bumped on every change; feeds the farmer dashboard ETag
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     # status 'open'/'assigned'/'confirmed'/'closed'
-    status = db.Column(db.String(30), default='open')
+    status = db.Column(db.String(30), default='open', index=True)
 
 class ViewNotification(db.Model):
+    __table_args__ = (
+        # one view row per (job, labour); also serves the job_id lookups
+        db.Index('ix_view_job_labour', 'job_id', 'labour_id', unique=True),
+        db.Index('ix_view_farmer_viewed', 'farmer_id', db.text('viewed_at DESC')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'))
-    labour_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # the job's farmer, copied at insert time so farmer pages can filter without joining job
+    farmer_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    labour_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    # copied from the labour's User row at insert time so notifications need no join
+    labour_name = db.Column(db.String(120))
+    labour_phone = db.Column(db.String(30))
     seen = db.Column(db.Boolean, default=False)
     viewed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ChangeRequest(db.Model):
+    __table_args__ = (
+        db.Index('ix_change_request_farmer_requested', 'farmer_id', db.text('requested_at DESC')),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey('job.id'))
-    labour_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), index=True)
+    farmer_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # copied from Job, as on ViewNotification
+    labour_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    labour_name = db.Column(db.String(120))  # copied from User, as on ViewNotification
+    labour_phone = db.Column(db.String(30))
     requested_days = db.Column(db.Integer, nullable=True)
     requested_wage = db.Column(db.String(50), nullable=True)
     requested_stay = db.Column(db.String(300), nullable=True)
     message = db.Column(db.Text)
     status = db.Column(db.String(30), default='pending')  # pending/accepted/rejected
     requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Assignment(db.Model):
+    __table_args__ = (
+        db.Index('ix_assignment_farmer_assigned', 'farmer_id', db.text('assigned_at DESC')),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey('job.id'))
-    labour_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), index=True)
+    farmer_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # copied from Job, as on ViewNotification
+    labour_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     accepted_by_farmer = db.Column(db.Boolean, default=False)
     confirmed_by_labour = db.Column(db.Boolean, default=False)
     assigned_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ---------------- Forms ----------------
+class PostJobIn(BaseModel):
+    title: str
+    work_type: Optional[str] = None
+    days: int = Field(1, ge=1)
+    stay_info: Optional[str] = None
+    wage: Optional[str] = None
+    location: Optional[str] = None
+    contact: Optional[str] = None
+
+class ChangeRequestIn(BaseModel):
+    requested_days: Optional[int] = Field(None, ge=1)
+    requested_wage: Optional[str] = None
+    requested_stay: Optional[str] = None
+    message: str = ''
+
+def parse_form(schema):
+    # blank inputs count as not given, so they fall back to the schema defaults
+    return schema.model_validate({k: v for k, v in request.form.items() if v != ''})
+
+# hot-path inserts built once and re-executed with new parameters,
+# so the compiled SQL is reused from SQLAlchemy's statement cache
+VIEW_INSERT = sqlite_insert(ViewNotification.__table__)\
+    .on_conflict_do_nothing(index_elements=['job_id', 'labour_id'])
+CHANGE_REQUEST_INSERT = ChangeRequest.__table__.insert()
+ASSIGNMENT_INSERT = Assignment.__table__.insert()
 
 # ---------------- Helpers ----------------
-def current_user():
-    uid = session.get('user_id')
-    if not uid:
+def cache_get(key):
+    if r is None:
         return None
-    return User.query.get(uid)
+    try:
+        return r.get(key)
+    except redis.RedisError:
+        return None
+
+def cache_set(key, value, ttl):
+    if r is None:
+        return
+    try:
+        r.set(key, value, ex=ttl)
+    except redis.RedisError:
+        pass
+
+def cache_delete(key):
+    if r is None:
+        return
+    try:
+        r.delete(key)
+    except redis.RedisError:
+        pass
+
+def cache_user(user):
+    # only the fields routes/templates read off the logged-in user
+    cache_set(f'user:{user.id}', orjson.dumps({
+        'id': user.id,
+        'name': user.name,
+        'phone': user.phone,
+        'role': user.role
+    }), USER_CACHE_TTL)
+
+def load_user(uid):
+    cached = cache_get(f'user:{uid}')
+    if cached:
+        return SimpleNamespace(**orjson.loads(cached))
+    user = db.session.get(User, uid)
+    if user:
+        cache_user(user)
+    return user
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+@functools.lru_cache(maxsize=None)
+def password_hash_params():
+    # PASSWORD_HASH_METHOD as it appears in stored hashes
+    method = PASSWORD_HASH_METHOD.split(':')
+    if (method[0] == 'scrypt' and len(method) == 4) or (method[0] == 'pbkdf2' and len(method) == 3):
+        return PASSWORD_HASH_METHOD
+    # short override like 'pbkdf2:sha256': let Werkzeug fill in its defaults, once, on first use
+    return generate_password_hash('', method=PASSWORD_HASH_METHOD).split('$', 1)[0]
+
+def verify_password(user, password):
+    if not check_password_hash(user.password_hash, password):
+        return False
+    # stored with a different method/cost than configured -> rehash now that we have the password
+    if user.password_hash.split('$', 1)[0] != password_hash_params():
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    return True
+
+# each list on a page has its own ?<list>_page= argument, so paging one leaves the others alone
+@app.template_global()
+def page_arg(param):
+    return max(request.args.get(param, 1, type=int), 1)
+
+@app.template_global()
+def page_url(param, page):
+    # the current URL with only this list's page changed; the query string is encoded
+    # on its own so request args can't reach url_for's options (_external, _anchor, ...)
+    args = request.args.to_dict()
+    args[param] = page
+    return url_for(request.endpoint, **request.view_args) + '?' + urlencode(args)
+
+class PageRows(list):
+    # one page of rows; has_more says whether a later page has any
+    has_more = False
+
+def page_rows(rows):
+    # rows holds up to PAGE_SIZE + 1 entries; the extra one only signals a next page
+    page = PageRows(rows[:PAGE_SIZE])
+    page.has_more = len(rows) > PAGE_SIZE
+    return page
+
+def paginate(query, page):
+    return page_rows(query.limit(PAGE_SIZE + 1).offset((page - 1) * PAGE_SIZE).all())
+
+def open_jobs(page):
+    # same list for every labourer, so serve it from Redis when we can
+    # (only the first page is cached; later pages are rare)
+    query = Job.query.filter(Job.status!='closed').order_by(Job.date_posted.desc())
+    if page > 1:
+        return paginate(query, page)
+    cached = cache_get('jobs:open')
+    if cached:
+        return page_rows([SimpleNamespace(**j) for j in orjson.loads(cached)])
+    # cached with the extra row, so has_more survives the round-trip
+    jobs = query.limit(PAGE_SIZE + 1).all()
+    cache_set('jobs:open', orjson.dumps([{
+        'id': j.id,
+        'title': j.title,
+        'work_type': j.work_type,
+        'days': j.days,
+        'stay_info': j.stay_info,
+        'wage': j.wage,
+        'location': j.location,
+        'contact': j.contact,
+        'status': j.status
+    } for j in jobs]), OPEN_JOBS_CACHE_TTL)
+    return page_rows(jobs)
+
+def warm_templates():
+    # load every template up front (from the bytecode cache when possible)
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+def farmer_dashboard_etag(user):
+    # latest change across everything the dashboard shows, in one query
+    stamps = db.session.query(func.max(Job.updated_at)).filter(Job.farmer_id == user.id).union_all(
+        db.session.query(func.max(ViewNotification.viewed_at)).filter(ViewNotification.farmer_id == user.id),
+        db.session.query(func.max(ChangeRequest.updated_at)).filter(ChangeRequest.farmer_id == user.id),
+        db.session.query(func.max(Assignment.updated_at)).filter(Assignment.farmer_id == user.id)
+    ).all()
+    key = f'{user.id}:{request.query_string.decode()}:' + ':'.join(str(stamp) for stamp, in stamps)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def current_user():
+    # looked up at most once per request, then reused from g
+    if 'user' not in g:
+        uid = session.get('user_id')
+        g.user = load_user(uid) if uid else None
+    return g.user
+
+def upgrade_db():
+    # bring a database.db written by an older version up to the current models:
+    # create_all() only adds missing tables, so add missing columns and indexes here
+    # and backfill the fields that are copied at insert time. Safe to run repeatedly.
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    # same REFERENCES clause a fresh create_all() would give the column
+                    refs = ''.join(f' REFERENCES "{fk.column.table.name}" ({fk.column.name})'
+                                   for fk in col.foreign_keys)
+                    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" '
+                                         f'{col.type.compile(db.engine.dialect)}{refs}')
+        # older versions could record the same view twice; keep the first before adding the
+        # unique index (once the index exists there can't be duplicates, so skip the scan)
+        if 'ix_view_job_labour' not in {ix['name'] for ix in inspector.get_indexes('view_notification')}:
+            conn.exec_driver_sql('DELETE FROM view_notification WHERE id NOT IN '
+                                 '(SELECT MIN(id) FROM view_notification GROUP BY job_id, labour_id)')
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        for table in ('view_notification', 'change_request', 'assignment'):
+            conn.exec_driver_sql(f'UPDATE {table} SET farmer_id = '
+                                 f'(SELECT farmer_id FROM job WHERE job.id = {table}.job_id) '
+                                 f'WHERE farmer_id IS NULL')
+        for table in ('view_notification', 'change_request'):
+            conn.exec_driver_sql(f'UPDATE {table} SET '
+                                 f'labour_name = (SELECT name FROM "user" WHERE "user".id = {table}.labour_id), '
+                                 f'labour_phone = (SELECT phone FROM "user" WHERE "user".id = {table}.labour_id) '
+                                 f'WHERE labour_name IS NULL')
+        for table, created in (('job', 'date_posted'), ('change_request', 'requested_at'),
+                               ('assignment', 'assigned_at')):
+            conn.exec_driver_sql(f'UPDATE {table} SET updated_at = {created} WHERE updated_at IS NULL')
 
-@app.before_request
 def init_db():
-    # create DB only if missing
-    if not os.path.exists("database.db"):
+    # create/upgrade tables; runs when this module is imported, whatever serves it
+    # (python app.py, flask run, any WSGI server). Under gunicorn the app is preloaded
+    # in the master (gunicorn.conf.py), so this runs once there rather than racing in
+    # each worker on CREATE TABLE.
+    with app.app_context():
         db.create_all()
+        upgrade_db()
+        # don't hand this process's pooled connection to forked workers
+        db.engine.dispose()
+
+init_db()
 
 # ---------------- Routes ----------------
 @app.route('/')
+# only anonymous visitors with no pending flash messages get the cached page
+@cache.cached(timeout=300, unless=lambda: bool(session.get('user_id') or session.get('_flashes')))
 def index():
     return render_template('index.html', user=current_user())
 
@@ -85,13 +374,16 @@ def farmer_register():
         name = request.form['name']
         phone = request.form['phone']
         password = request.form['password']
-        if User.query.filter_by(phone=phone).first():
-            flash('Phone already registered')
-            return redirect(url_for('farmer_register'))
-        hashed = generate_password_hash(password)
+        hashed = hash_password(password)
         user = User(name=name, phone=phone, password_hash=hashed, role='farmer')
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # phone is unique, so the insert itself is the duplicate check
+            db.session.rollback()
+            flash('Phone already registered')
+            return redirect(url_for('farmer_register'))
         flash('Registered! Please login.')
         return redirect(url_for('farmer_login'))
     return render_template('farmer_register.html')
@@ -102,9 +394,10 @@ def farmer_login():
         phone = request.form['phone']
         password = request.form['password']
         user = User.query.filter_by(phone=phone, role='farmer').first()
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user, password):
             session['user_id'] = user.id
             session['role'] = 'farmer'
+            cache_user(user)
             return redirect(url_for('farmer_dashboard'))
         flash('Invalid credentials')
     return render_template('farmer_login.html')
@@ -116,13 +409,16 @@ def labour_register():
         name = request.form['name']
         phone = request.form['phone']
         password = request.form['password']
-        if User.query.filter_by(phone=phone).first():
-            flash('Phone already registered')
-            return redirect(url_for('labour_register'))
-        hashed = generate_password_hash(password)
+        hashed = hash_password(password)
         user = User(name=name, phone=phone, password_hash=hashed, role='labour')
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # phone is unique, so the insert itself is the duplicate check
+            db.session.rollback()
+            flash('Phone already registered')
+            return redirect(url_for('labour_register'))
         flash('Registered! Please login.')
         return redirect(url_for('labour_login'))
     return render_template('labour_register.html')
@@ -133,9 +429,10 @@ def labour_login():
         phone = request.form['phone']
         password = request.form['password']
         user = User.query.filter_by(phone=phone, role='labour').first()
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user, password):
             session['user_id'] = user.id
             session['role'] = 'labour'
+            cache_user(user)
             return redirect(url_for('labour_dashboard'))
         flash('Invalid credentials')
     return render_template('labour_login.html')
@@ -152,25 +449,32 @@ def farmer_dashboard():
     user = current_user()
     if not user or user.role != 'farmer':
         return redirect(url_for('farmer_login'))
-    jobs = Job.query.filter_by(farmer_id=user.id).order_by(Job.date_posted.desc()).all()
+    # nothing changed since the browser's copy -> skip the queries and render
+    # (pending flash messages must still be rendered, so those always get a full page)
+    etag = farmer_dashboard_etag(user)
+    if etag in request.if_none_match and not session.get('_flashes'):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
 
-    # prepare detailed views and change requests for this farmer's jobs
-    views = ViewNotification.query.join(Job, ViewNotification.job_id == Job.id)\
-        .filter(Job.farmer_id == user.id).order_by(ViewNotification.viewed_at.desc()).all()
-    # expand labour info for templates
-    view_details = []
-    for v in views:
-        labour = User.query.get(v.labour_id)
-        view_details.append({'view': v, 'labour': labour})
+    jobs = paginate(Job.query.filter_by(farmer_id=user.id).order_by(Job.date_posted.desc()),
+                    page_arg('jobs_page'))
 
-    change_reqs = ChangeRequest.query.join(Job, ChangeRequest.job_id == Job.id)\
-        .filter(Job.farmer_id == user.id).order_by(ChangeRequest.requested_at.desc()).all()
+    # views and change requests for this farmer's jobs (labour name/phone are stored on the rows)
+    views = paginate(ViewNotification.query.filter_by(farmer_id=user.id)
+                     .order_by(ViewNotification.viewed_at.desc()), page_arg('views_page'))
 
-    assignments = Assignment.query.join(Job, Assignment.job_id == Job.id)\
-        .filter(Job.farmer_id == user.id).order_by(Assignment.assigned_at.desc()).all()
+    change_reqs = paginate(ChangeRequest.query.filter_by(farmer_id=user.id)
+                           .order_by(ChangeRequest.requested_at.desc()), page_arg('changes_page'))
 
-    return render_template('farmer_dashboard.html', user=user, jobs=jobs,
-                           view_details=view_details, change_reqs=change_reqs, assignments=assignments)
+    assignments = paginate(Assignment.query.filter_by(farmer_id=user.id)
+                           .order_by(Assignment.assigned_at.desc()), page_arg('assignments_page'))
+
+    response = make_response(render_template('farmer_dashboard.html', user=user, jobs=jobs,
+                             views=views, change_reqs=change_reqs, assignments=assignments))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'  # always revalidate
+    return response
 
 # ---------- Post Job ----------
 @app.route('/farmer/post_job', methods=['GET', 'POST'])
@@ -179,17 +483,15 @@ def post_job():
     if not user or user.role != 'farmer':
         return redirect(url_for('farmer_login'))
     if request.method == 'POST':
-        title = request.form['title']
-        work_type = request.form.get('work_type')
-        days = int(request.form.get('days') or 1)
-        stay_info = request.form.get('stay_info')
-        wage = request.form.get('wage')
-        location = request.form.get('location')
-        contact = request.form.get('contact')
-        job = Job(farmer_id=user.id, title=title, work_type=work_type, days=days,
-                  stay_info=stay_info, wage=wage, location=location, contact=contact)
+        try:
+            data = parse_form(PostJobIn)
+        except ValidationError:
+            flash('Please check the job details')
+            return redirect(url_for('post_job'))
+        job = Job(farmer_id=user.id, **data.model_dump())
         db.session.add(job)
         db.session.commit()
+        cache_delete('jobs:open')
         flash('Job posted')
         return redirect(url_for('farmer_dashboard'))
     return render_template('post_job.html', user=user)
@@ -200,24 +502,29 @@ def labour_dashboard():
     user = current_user()
     if not user or user.role != 'labour':
         return redirect(url_for('labour_login'))
-    jobs = Job.query.filter(Job.status!='closed').order_by(Job.date_posted.desc()).all()
-    assignments = Assignment.query.filter_by(labour_id=user.id).all()
+    jobs = open_jobs(page_arg('jobs_page'))
+    assignments = paginate(Assignment.query.filter_by(labour_id=user.id)
+                           .order_by(Assignment.assigned_at.desc()), page_arg('assignments_page'))
     return render_template('labour_dashboard.html', user=user, jobs=jobs, assignments=assignments)
 
 # ---------- View job (labour views creates a view notification with labour details) ----------
 @app.route('/job/<int:job_id>')
 def job_view(job_id):
     user = current_user()
-    job = Job.query.get_or_404(job_id)
-    farmer = User.query.get(job.farmer_id)
+    job = db.get_or_404(Job, job_id)
+    farmer = db.session.get(User, job.farmer_id)
 
     # store view notification with labour details if labour is logged in
+    # (ix_view_job_labour is unique, so repeat views are ignored by the DB)
     if user and user.role == 'labour':
-        existing = ViewNotification.query.filter_by(job_id=job_id, labour_id=user.id).first()
-        if not existing:
-            v = ViewNotification(job_id=job_id, labour_id=user.id)
-            db.session.add(v)
-            db.session.commit()
+        db.session.execute(VIEW_INSERT, {
+            'job_id': job_id,
+            'farmer_id': job.farmer_id,
+            'labour_id': user.id,
+            'labour_name': user.name,
+            'labour_phone': user.phone
+        })
+        db.session.commit()
 
     # get change requests for this job
     change_reqs = ChangeRequest.query.filter_by(job_id=job_id).order_by(ChangeRequest.requested_at.desc()).all()
@@ -230,19 +537,20 @@ def request_change(job_id):
     if not user or user.role != 'labour':
         flash('Please login as labour to request changes')
         return redirect(url_for('labour_login'))
-    requested_days = request.form.get('requested_days')
-    requested_wage = request.form.get('requested_wage')
-    requested_stay = request.form.get('requested_stay')
-    message = request.form.get('message', '')
-    cr = ChangeRequest(
-        job_id=job_id,
-        labour_id=user.id,
-        requested_days=int(requested_days) if requested_days else None,
-        requested_wage=requested_wage if requested_wage else None,
-        requested_stay=requested_stay if requested_stay else None,
-        message=message
-    )
-    db.session.add(cr)
+    job = db.get_or_404(Job, job_id)
+    try:
+        data = parse_form(ChangeRequestIn)
+    except ValidationError:
+        flash('Please check the requested changes')
+        return redirect(url_for('job_view', job_id=job_id))
+    db.session.execute(CHANGE_REQUEST_INSERT, {
+        'job_id': job_id,
+        'farmer_id': job.farmer_id,
+        'labour_id': user.id,
+        'labour_name': user.name,
+        'labour_phone': user.phone,
+        **data.model_dump()
+    })
     db.session.commit()
     flash('Change request sent to farmer')
     return redirect(url_for('job_view', job_id=job_id))
@@ -253,19 +561,19 @@ def decide_change(change_id):
     user = current_user()
     if not user or user.role != 'farmer':
         return redirect(url_for('farmer_login'))
-    cr = ChangeRequest.query.get_or_404(change_id)
+    cr = db.get_or_404(ChangeRequest, change_id)
     decision = request.form.get('decision')  # 'accept' or 'reject'
     if decision == 'accept':
         cr.status = 'accepted'
+        job = db.session.get(Job, cr.job_id)
         # create assignment if not exists
         assign = Assignment.query.filter_by(job_id=cr.job_id, labour_id=cr.labour_id).first()
         if not assign:
-            assign = Assignment(job_id=cr.job_id, labour_id=cr.labour_id, accepted_by_farmer=True)
-            db.session.add(assign)
+            db.session.execute(ASSIGNMENT_INSERT, {'job_id': cr.job_id, 'farmer_id': job.farmer_id,
+                                                   'labour_id': cr.labour_id, 'accepted_by_farmer': True})
         else:
             assign.accepted_by_farmer = True
         # apply the requested changes to job (optional: override job fields)
-        job = Job.query.get(cr.job_id)
         if cr.requested_days:
             job.days = cr.requested_days
         if cr.requested_wage:
@@ -274,6 +582,7 @@ def decide_change(change_id):
             job.stay_info = cr.requested_stay
         job.status = 'assigned'
         db.session.commit()
+        cache_delete('jobs:open')
         flash('Change accepted and labour assigned (awaiting labour confirmation).')
     else:
         cr.status = 'rejected'
@@ -287,15 +596,18 @@ def assign_labour(job_id, labour_id):
     user = current_user()
     if not user or user.role != 'farmer':
         return redirect(url_for('farmer_login'))
+    # foreign keys are enforced, so 404 on an unknown job/labour instead of failing the insert
+    job = db.get_or_404(Job, job_id)
+    db.get_or_404(User, labour_id)
     assign = Assignment.query.filter_by(job_id=job_id, labour_id=labour_id).first()
     if not assign:
-        assign = Assignment(job_id=job_id, labour_id=labour_id, accepted_by_farmer=True)
-        db.session.add(assign)
+        db.session.execute(ASSIGNMENT_INSERT, {'job_id': job_id, 'farmer_id': job.farmer_id,
+                                               'labour_id': labour_id, 'accepted_by_farmer': True})
     else:
         assign.accepted_by_farmer = True
-    job = Job.query.get(job_id)
     job.status = 'assigned'
     db.session.commit()
+    cache_delete('jobs:open')
     flash('Labour accepted for job. Waiting for labour confirmation.')
     return redirect(url_for('farmer_dashboard'))
 
@@ -305,16 +617,17 @@ def confirm_assignment(assign_id):
     user = current_user()
     if not user or user.role != 'labour':
         return redirect(url_for('labour_login'))
-    assign = Assignment.query.get_or_404(assign_id)
+    assign = db.get_or_404(Assignment, assign_id)
     if assign.labour_id != user.id:
         flash('Not allowed')
         return redirect(url_for('labour_dashboard'))
     assign.confirmed_by_labour = True
     # if both accepted & confirmed -> mark job confirmed
-    job = Job.query.get(assign.job_id)
+    job = db.session.get(Job, assign.job_id)
     if assign.accepted_by_farmer and assign.confirmed_by_labour:
         job.status = 'confirmed'
     db.session.commit()
+    cache_delete('jobs:open')
     flash('You confirmed the assignment.')
     return redirect(url_for('labour_dashboard'))
 
@@ -325,43 +638,17 @@ def farmer_notifications():
     if not user or user.role != 'farmer':
         return redirect(url_for('farmer_login'))
 
-    # Labour views with full labour details
-    views = ViewNotification.query.join(Job, ViewNotification.job_id == Job.id) \
-        .filter(Job.farmer_id == user.id) \
-        .order_by(ViewNotification.viewed_at.desc()) \
-        .all()
-
-    view_list = []
-    for v in views:
-        labour = User.query.get(v.labour_id)
-        job = Job.query.get(v.job_id)
-        view_list.append({
-            'view': v,
-            'labour': labour,
-            'job': job
-        })
+    # Labour views with labour details (stored on the row); job is joined only for its title
+    views = paginate(db.session.query(ViewNotification, Job)
+                     .join(Job, ViewNotification.job_id == Job.id)
+                     .filter(ViewNotification.farmer_id == user.id)
+                     .order_by(ViewNotification.viewed_at.desc()), page_arg('views_page'))
+
+    view_list = [{'view': v, 'job': job} for v, job in views]
 
     # Change requests with labour details
-    change_reqs_raw = ChangeRequest.query.join(Job, ChangeRequest.job_id == Job.id) \
-        .filter(Job.farmer_id == user.id) \
-        .order_by(ChangeRequest.requested_at.desc()) \
-        .all()
-
-    change_reqs = []
-    for cr in change_reqs_raw:
-        labour = User.query.get(cr.labour_id)
-        change_reqs.append({
-            'id': cr.id,
-            'job_id': cr.job_id,
-            'requested_days': cr.requested_days,
-            'requested_wage': cr.requested_wage,
-            'requested_stay': cr.requested_stay,
-            'message': cr.message,
-            'status': cr.status,
-            'requested_at': cr.requested_at,
-            'labour_name': labour.name,
-            'labour_phone': labour.phone
-        })
+    change_reqs = paginate(ChangeRequest.query.filter_by(farmer_id=user.id)
+                           .order_by(ChangeRequest.requested_at.desc()), page_arg('changes_page'))
 
     return render_template(
         'notifications.html',
@@ -371,5 +658,6 @@ def farmer_notifications():
     )
 
 # ---------------- Run ----------------
+# dev server only; production runs under gunicorn (gunicorn app:app)
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1')
@@ -0,0 +1,20 @@
+# picked up automatically by `gunicorn app:app` when run from the project root
+import os
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+# a few processes, each with a thread pool; SQLite in WAL mode handles the
+# concurrent readers and keeps writes serialized
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# import app.py once in the master (which also creates/upgrades the tables) and fork
+# workers from it. The master keeps the code it started with: `kill -HUP` and
+# --reload only restart workers on that old code, so deploy code changes with a
+# full restart of gunicorn.
+preload_app = True
+
+
+def post_worker_init(worker):
+    # compile templates before the worker takes traffic
+    from app import warm_templates
+    warm_templates()